@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.routes.upload import router as upload_router
 
 def create_app():
@@ -18,6 +19,14 @@ def create_app():
         allow_headers=["*"],
     )
 
+    # Compress large responses; brotli when brotli-asgi is installed
+    # (it falls back to gzip for clients without br support)
+    try:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, minimum_size=1000)
+    except ImportError:
+        app.add_middleware(GZipMiddleware, minimum_size=1000)
+
     app.include_router(upload_router)
 
     return app
\ No newline at end of file
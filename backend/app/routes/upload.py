@@ -1,7 +1,12 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 import os
+import uuid
+import time
 import shutil
+import asyncio
+import orjson
 
 from app.services.pdf_extractor import (
     detect_pdf_type,
@@ -9,93 +14,255 @@ from app.services.pdf_extractor import (
     extract_table_rows_as_markdown
 )
 from app.services.splitter import split_records
-from app.services.local_llm_extractor import extract_multiple_blocks_parallel
+from app.services.local_llm_extractor import (
+    CONFIG_FINGERPRINT,
+    TierStats,
+    scheduler,
+    extract_multiple_blocks_parallel
+)
+from app.services.llm_scheduler import DeadlineExceeded
+from app.services.job_store import (
+    compute_job_id,
+    claim_job,
+    complete_job,
+    fail_job,
+    get_job,
+    get_job_result,
+    job_heartbeat
+)
+from app.schemas.semantic_schema import SEMANTIC_FIELDS, to_columnar
 from app.utils.logger import log
 
 router = APIRouter()
 
+# Seconds between checks while another worker processes the same PDF
+JOB_POLL_INTERVAL = 1.0
 
-@router.post("/upload")
-async def upload(file: UploadFile = File(...)):
 
-    try:
-        os.makedirs("uploads", exist_ok=True)
+class FastJSONResponse(Response):
+    """
+    JSON response encoded with orjson, which also handles IntelRecord.
+    """
 
-        # Sanitize filename
-        safe_filename = os.path.basename(file.filename)
-        pdf_path = os.path.join("uploads", safe_filename)
+    media_type = "application/json"
 
-        with open(pdf_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
 
-        log("UPLOAD", safe_filename)
 
-        # =====================================
-        # Detect PDF Type
-        # =====================================
-        pdf_type = detect_pdf_type(pdf_path)
+def _process_pdf(pdf_path: str, priority: str, deadline) -> dict:
 
-        # =====================================
-        # TABLE PDF
-        # =====================================
-        if pdf_type == "table":
+    # =====================================
+    # Detect PDF Type
+    # =====================================
+    pdf_type = detect_pdf_type(pdf_path)
 
-            blocks = extract_table_rows_as_markdown(pdf_path)
+    # =====================================
+    # TABLE PDF
+    # =====================================
+    if pdf_type == "table":
 
-            if not blocks:
-                raise HTTPException(
-                    status_code=400,
-                    detail="No table rows extracted"
-                )
+        blocks = extract_table_rows_as_markdown(pdf_path)
 
-        # =====================================
-        # NARRATIVE PDF
-        # =====================================
-        else:
+        if not blocks:
+            raise HTTPException(
+                status_code=400,
+                detail="No table rows extracted"
+            )
+
+    # =====================================
+    # NARRATIVE PDF
+    # =====================================
+    else:
+
+        markdown_text = extract_narrative_markdown(pdf_path)
+
+        if not markdown_text:
+            raise HTTPException(
+                status_code=400,
+                detail="No readable text found"
+            )
+
+        blocks = split_records(markdown_text)
+
+        if not blocks:
+            blocks = [markdown_text]
+
+    # =====================================
+    # Filter Garbage Blocks (IMPORTANT)
+    # =====================================
+    blocks = [
+        b for b in blocks
+        if b and len(b.strip()) > 50
+    ]
+
+    if not blocks:
+        raise HTTPException(
+            status_code=400,
+            detail="No valid intelligence records detected"
+        )
+
+    log("PROCESS", f"Sending {len(blocks)} blocks to LLM")
+
+    stats = TierStats()
+    results = extract_multiple_blocks_parallel(blocks, stats, priority, deadline)
+
+    return {
+        "status": "success",
+        "records": len(results),
+        "data": results,
+        "llm_stats": stats.summary()
+    }
+
+
+def _store_upload(src, safe_filename: str):
+    """
+    Save the upload under its job directory. Returns (job_id, pdf_path).
+    """
+
+    os.makedirs("uploads", exist_ok=True)
+
+    # Unique temp name: several workers may receive the same filename
+    tmp_path = os.path.join("uploads", f".{uuid.uuid4().hex}.part")
+
+    with open(tmp_path, "wb") as buffer:
+        shutil.copyfileobj(src, buffer)
+
+    job_id = compute_job_id(tmp_path, CONFIG_FINGERPRINT)
 
-            markdown_text = extract_narrative_markdown(pdf_path)
+    job_dir = os.path.join("uploads", job_id[:16])
+    os.makedirs(job_dir, exist_ok=True)
+    pdf_path = os.path.join(job_dir, safe_filename)
+    os.replace(tmp_path, pdf_path)
 
-            if not markdown_text:
-                raise HTTPException(
-                    status_code=400,
-                    detail="No readable text found"
-                )
+    return job_id, pdf_path
 
-            blocks = split_records(markdown_text)
 
-            if not blocks:
-                blocks = [markdown_text]
+def _run_job(job_id: str, pdf_path: str, priority: str, deadline) -> dict:
+    # Heartbeat for the whole run, so other workers wait on the job
+    with job_heartbeat(job_id):
+        return _process_pdf(pdf_path, priority, deadline)
+
+
+def _render(body: bytes, job_id: str, cached: bool, response_format: str, result: dict = None):
+    """
+    body is the encoded result, as stored in the job cache.
+
+    rows: data is a list of records. body is sent as is, with the job
+    fields spliced in front, so the result is never encoded twice.
+    columnar: data maps each field to an array, one entry per record.
+    """
+
+    if response_format == "columnar":
+        content = result if result is not None else orjson.loads(body)
+        return FastJSONResponse({
+            **content,
+            "job_id": job_id,
+            "cached": cached,
+            "format": "columnar",
+            "columns": list(SEMANTIC_FIELDS),
+            "data": to_columnar(content["data"])
+        })
+
+    meta = orjson.dumps({"job_id": job_id, "cached": cached})
+    return Response(meta[:-1] + b"," + body[1:], media_type="application/json")
+
+
+@router.post("/upload")
+async def upload(
+    file: UploadFile = File(...),
+    response_format: str = Query("rows", alias="format", pattern="^(rows|columnar)$"),
+    priority: str = Query("interactive", pattern="^(interactive|bulk)$"),
+    deadline_s: float = Query(None, alias="deadline", gt=0)
+):
+
+    # Seconds from receipt; blocks still queued past it are cancelled
+    deadline = time.monotonic() + deadline_s if deadline_s else None
+
+    try:
+        # Sanitize filename
+        safe_filename = os.path.basename(file.filename)
+
+        # File I/O, hashing and SQLite calls block; keep them off the event loop
+        job_id, pdf_path = await run_in_threadpool(_store_upload, file.file, safe_filename)
+
+        log("UPLOAD", f"{safe_filename} (job {job_id[:16]})")
 
         # =====================================
-        # Filter Garbage Blocks (IMPORTANT)
+        # Cross-Worker Dedup
         # =====================================
-        blocks = [
-            b for b in blocks
-            if b and len(b.strip()) > 50
-        ]
+        state, result = await run_in_threadpool(claim_job, job_id, safe_filename)
 
-        if not blocks:
-            raise HTTPException(
-                status_code=400,
-                detail="No valid intelligence records detected"
-            )
+        while state == "running":
+            if deadline is not None and time.monotonic() > deadline:
+                raise DeadlineExceeded("Deadline exceeded")
 
-        log("PROCESS", f"Sending {len(blocks)} blocks to LLM")
+            await asyncio.sleep(JOB_POLL_INTERVAL)
 
-        results = extract_multiple_blocks_parallel(blocks)
+            result = await run_in_threadpool(get_job_result, job_id)
+            if result is not None:
+                state = "cached"
+                break
 
-        return JSONResponse({
-            "status": "success",
-            "records": len(results),
-            "data": results
-        })
+            # Reclaims the job if the other worker failed or died
+            state, result = await run_in_threadpool(claim_job, job_id, safe_filename)
+
+        if state == "cached":
+            log("UPLOAD", f"Serving cached result for job {job_id[:16]}")
+            return _render(result, job_id, True, response_format)
+
+        # =====================================
+        # Process (claimed by this worker)
+        # =====================================
+        try:
+            result = await run_in_threadpool(_run_job, job_id, pdf_path, priority, deadline)
+        except HTTPException as e:
+            await run_in_threadpool(fail_job, job_id, e.detail)
+            raise
+        except Exception as e:
+            await run_in_threadpool(fail_job, job_id, str(e))
+            raise
+
+        # Encoded once, for both the cache and the response.
+        # Results with failed blocks (LLM errors) are not cached.
+        body = orjson.dumps(result)
+        cacheable = result["llm_stats"]["failed_blocks"] == 0
+        await run_in_threadpool(complete_job, job_id, body if cacheable else None)
+
+        return _render(body, job_id, False, response_format, result)
 
     except HTTPException:
         raise
 
+    except DeadlineExceeded:
+        log("UPLOAD", f"Deadline of {deadline_s}s exceeded")
+        raise HTTPException(
+            status_code=504,
+            detail="Deadline exceeded"
+        )
+
     except Exception as e:
         log("ERROR", str(e))
         raise HTTPException(
             status_code=500,
             detail="Processing failed"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+
+    job = await run_in_threadpool(get_job, job_id)
+
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found"
+        )
+
+    return JSONResponse(job)
+
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    return JSONResponse(scheduler.stats())
@@ -1,3 +1,5 @@
+from dataclasses import make_dataclass, field
+
 SEMANTIC_SCHEMA = {
     "date": None,
     "fmn": None,
@@ -19,3 +21,35 @@ SEMANTIC_SCHEMA = {
     "weapons": None,
     "ammunition": None
 }
+
+SEMANTIC_FIELDS = tuple(SEMANTIC_SCHEMA)
+
+# Slotted record generated from SEMANTIC_SCHEMA; far smaller than a 19-key dict
+IntelRecord = make_dataclass(
+    "IntelRecord",
+    [(name, object, field(default=None)) for name in SEMANTIC_FIELDS],
+    slots=True
+)
+
+
+def record_from_dict(data: dict) -> "IntelRecord":
+    """
+    Build a record from LLM output, dropping keys outside the schema.
+    """
+
+    return IntelRecord(*(data.get(name) for name in SEMANTIC_FIELDS))
+
+
+def to_columnar(rows: list) -> dict:
+    """
+    Field → array layout. Accepts IntelRecord instances or dicts.
+    """
+
+    columns = {name: [] for name in SEMANTIC_FIELDS}
+
+    for row in rows:
+        for name in SEMANTIC_FIELDS:
+            value = row.get(name) if isinstance(row, dict) else getattr(row, name)
+            columns[name].append(value)
+
+    return columns
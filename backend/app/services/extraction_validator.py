@@ -0,0 +1,136 @@
+import os
+import re
+from dotenv import load_dotenv
+from app.schemas.semantic_schema import SEMANTIC_SCHEMA
+
+# ==========================================
+# Load Environment Variables
+# ==========================================
+
+load_dotenv()
+
+LLM_CASCADE_MAX_NULL_RATIO = float(os.getenv("LLM_CASCADE_MAX_NULL_RATIO", "0.75"))
+
+ENGAGEMENT_TYPES = {
+    "Movement", "Arrest", "Recovery", "Offensive", "Meeting",
+    "Explosion", "IED", "Extortion", "Surrender",
+    "Subversive Activity", "Intelligence Input",
+    "Firefight", "Warning", "Political Activity"
+}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20
+}
+
+# ==========================================
+# Regex Findings
+# ==========================================
+
+MONTH_NAMES = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?"
+    r"|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+
+# 12 Jan 24, 12-January-2024, 12/01/2024. Numeric dates need - / or .
+# separators, so quantities like "3 Nos 303" or "15 cadres 200 m" are
+# not taken for dates.
+DATE_PATTERN = re.compile(
+    r"\b\d{1,2}(?:[-/.]\d{1,2}[-/.]|[-\s/.]" + MONTH_NAMES + r"\.?,?[-\s/.])\d{2,4}\b",
+    re.IGNORECASE
+)
+
+COORD_PATTERN = re.compile(
+    r"\b\d{1,3}(?:\.\d+)?\s*°?\s*[NS]\b.{0,5}\b\d{1,3}(?:\.\d+)?\s*°?\s*[EW]\b"
+    r"|\bGR\s*\d{4,}\b"
+    r"|\b\d{1,2}\.\d{3,}\s*,\s*\d{2,3}\.\d{3,}\b",
+    re.IGNORECASE
+)
+
+
+def find_regex_fields(text: str) -> dict:
+    """
+    Fields that can be spotted reliably without the LLM.
+    """
+
+    return {
+        "date": bool(DATE_PATTERN.search(text)),
+        "coordinates": bool(COORD_PATTERN.search(text))
+    }
+
+
+def _to_int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _number_in_text(number: int, text: str) -> bool:
+    if re.search(rf"(?<!\d){number}(?!\d)", text):
+        return True
+
+    lower = text.lower()
+    return any(
+        n == number and re.search(rf"\b{word}\b", lower)
+        for word, n in NUMBER_WORDS.items()
+    )
+
+
+# ==========================================
+# Confidence Check
+# ==========================================
+
+def validate_extraction(parsed, text: str) -> list[str]:
+    """
+    Returns the reasons an extraction looks unreliable.
+    An empty list means the result can be accepted.
+    """
+
+    if not isinstance(parsed, dict):
+        return ["not a JSON object"]
+
+    reasons = []
+
+    # Schema validity
+    missing = [k for k in SEMANTIC_SCHEMA if k not in parsed]
+    if missing:
+        reasons.append(f"missing fields {missing}")
+
+    # Small models sometimes return lists or objects here
+    engagement = parsed.get("engagement_type_reasoned")
+    if engagement is not None and (
+        not isinstance(engagement, str) or engagement not in ENGAGEMENT_TYPES
+    ):
+        reasons.append(f"invalid engagement type {engagement!r}")
+
+    cadres_min = parsed.get("cadres_min")
+    cadres_max = parsed.get("cadres_max")
+    min_value = _to_int(cadres_min)
+    max_value = _to_int(cadres_max)
+
+    if cadres_min is not None and min_value is None:
+        reasons.append("cadres_min not numeric")
+    if cadres_max is not None and max_value is None:
+        reasons.append("cadres_max not numeric")
+    if min_value is not None and max_value is not None and min_value > max_value:
+        reasons.append("cadres_min greater than cadres_max")
+
+    # Agreement with regex findings
+    found = find_regex_fields(text)
+
+    for key, present in found.items():
+        if present and parsed.get(key) in (None, ""):
+            reasons.append(f"{key} present in text but not extracted")
+
+    for value in (min_value, max_value):
+        if value is not None and not _number_in_text(value, text):
+            reasons.append(f"cadre count {value} not found in text")
+
+    # Null ratio
+    nulls = sum(1 for k in SEMANTIC_SCHEMA if parsed.get(k) in (None, ""))
+    if nulls / len(SEMANTIC_SCHEMA) > LLM_CASCADE_MAX_NULL_RATIO:
+        reasons.append(f"{nulls}/{len(SEMANTIC_SCHEMA)} fields null")
+
+    return reasons
@@ -0,0 +1,464 @@
+import os
+import time
+import socket
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from app.services.llm_scheduler import PRIORITY_CLASSES, DeadlineExceeded
+from app.utils.logger import log
+
+# ==========================================
+# Load Environment Variables
+# ==========================================
+
+load_dotenv()
+
+# SQLite file shared by all workers on this host
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+
+# Seconds a finished result is served from cache (0 disables caching)
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+
+# Results are purged after the TTL, but kept at least this long for
+# workers polling on the same job
+RESULT_MIN_RETENTION = 60
+
+# A running job renews its heartbeat every JOB_HEARTBEAT_INTERVAL seconds;
+# one silent for JOB_STALE_SECONDS is assumed dead and can be reclaimed
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "60"))
+
+HOSTNAME = socket.gethostname()
+
+# Concurrent LLM calls across all workers (0 = no global cap).
+# Production mode runs several workers, so the cap defaults to
+# LLM_MAX_WORKERS there; a single process is already bounded by it.
+SERVE_MODE = os.getenv("SERVE_MODE", "development").lower()
+LLM_GLOBAL_MAX_CONCURRENCY = int(os.getenv(
+    "LLM_GLOBAL_MAX_CONCURRENCY",
+    os.getenv("LLM_MAX_WORKERS", "4") if SERVE_MODE == "production" else "0"
+))
+
+# Slot lease; renewed while the call runs, so it only matters for
+# workers that die while holding a slot
+LLM_SLOT_LEASE = float(os.getenv("LLM_SLOT_LEASE", "30"))
+
+# Seconds between slot checks, and after which a silent waiter is dropped
+SLOT_POLL_INTERVAL = 0.1
+SLOT_REQUEST_STALE = 10.0
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    filename    TEXT,
+    status      TEXT NOT NULL,
+    owner_pid    INTEGER,
+    owner_host   TEXT,
+    started_at   REAL,
+    heartbeat_at REAL,
+    finished_at  REAL,
+    result       BLOB,
+    error        TEXT
+);
+CREATE TABLE IF NOT EXISTS llm_slots (
+    slot_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_pid  INTEGER,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slot_requests (
+    request_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    rank         INTEGER NOT NULL,
+    deadline_at  REAL,
+    owner_pid    INTEGER,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+# Columns added after the first release; older databases are migrated
+JOB_COLUMNS = {
+    "owner_host": "TEXT",
+    "heartbeat_at": "REAL"
+}
+
+_initialized = False
+
+
+# ==========================================
+# Connection
+# ==========================================
+
+def _connect() -> sqlite3.Connection:
+    """
+    New autocommit connection. Connections are cheap and not shared
+    between threads.
+    """
+
+    global _initialized
+
+    conn = sqlite3.connect(JOB_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+
+    if not _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA_SQL)
+
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in JOB_COLUMNS.items():
+            if column not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError:
+                    pass  # Another worker added it first
+
+        _initialized = True
+
+    return conn
+
+
+@contextmanager
+def _transaction():
+    """
+    Write transaction that holds the database lock from the start,
+    so check-then-write sequences are atomic across workers.
+    """
+
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+# ==========================================
+# Job Registry
+# ==========================================
+
+def compute_job_id(pdf_path: str, config_fingerprint: str) -> str:
+    """
+    Hash of the PDF contents and the extraction config.
+    """
+
+    digest = hashlib.sha256(config_fingerprint.encode())
+
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _owner_alive(row, now: float) -> bool:
+    """
+    Whether the worker running a job is still alive: its heartbeat is
+    recent and, when it runs on this host, its process still exists.
+    """
+
+    heartbeat = row["heartbeat_at"] or row["started_at"]
+    if now - heartbeat >= JOB_STALE_SECONDS:
+        return False
+
+    if row["owner_host"] == HOSTNAME and row["owner_pid"] != os.getpid():
+        try:
+            os.kill(row["owner_pid"], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass  # Exists, owned by another user
+
+    return True
+
+
+def claim_job(job_id: str, filename: str):
+    """
+    Try to take ownership of a job.
+
+    Returns ("cached", result) when a fresh result exists (the
+    encoded JSON bytes stored by complete_job),
+    ("running", None) when another worker is processing it,
+    or ("claimed", None) when this worker should process it.
+    """
+
+    now = time.time()
+
+    with _transaction() as conn:
+        # Expired result blobs would otherwise grow jobs.db without bound
+        conn.execute(
+            "UPDATE jobs SET result = NULL WHERE result IS NOT NULL AND finished_at < ?",
+            (now - max(RESULT_CACHE_TTL, RESULT_MIN_RETENTION),)
+        )
+
+        row = conn.execute(
+            """
+            SELECT status, owner_pid, owner_host, started_at, heartbeat_at, finished_at, result
+            FROM jobs WHERE job_id = ?
+            """,
+            (job_id,)
+        ).fetchone()
+
+        if row is not None:
+            if (
+                row["status"] == "done"
+                and row["result"] is not None
+                and RESULT_CACHE_TTL > 0
+                and now - row["finished_at"] < RESULT_CACHE_TTL
+            ):
+                return "cached", row["result"]
+
+            if row["status"] == "running" and _owner_alive(row, now):
+                return "running", None
+
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO jobs
+                (job_id, filename, status, owner_pid, owner_host, started_at, heartbeat_at)
+            VALUES (?, ?, 'running', ?, ?, ?, ?)
+            """,
+            (job_id, filename, os.getpid(), HOSTNAME, now, now)
+        )
+
+    return "claimed", None
+
+
+def _renew_job(job_id: str, stop: threading.Event):
+    while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+        try:
+            with _transaction() as conn:
+                conn.execute(
+                    """
+                    UPDATE jobs SET heartbeat_at = ?
+                    WHERE job_id = ? AND status = 'running' AND owner_pid = ?
+                    """,
+                    (time.time(), job_id, os.getpid())
+                )
+        except sqlite3.Error as e:
+            log("JOB", f"Heartbeat failed for job {job_id[:16]}: {e}")
+
+
+@contextmanager
+def job_heartbeat(job_id: str):
+    """
+    Keep a claimed job marked alive while its body runs, however long
+    the PDF takes, so other workers wait instead of reclaiming it.
+    """
+
+    stop = threading.Event()
+    renewer = threading.Thread(
+        target=_renew_job,
+        args=(job_id, stop),
+        name=f"job-{job_id[:16]}",
+        daemon=True
+    )
+    renewer.start()
+
+    try:
+        yield
+    finally:
+        stop.set()
+        renewer.join()
+
+
+def complete_job(job_id: str, result: bytes = None):
+    """
+    Mark a job done, caching its encoded JSON result. Pass None
+    (some blocks failed) to skip caching, so the next upload of the
+    PDF is processed again.
+    """
+
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, result = ? WHERE job_id = ?",
+            (time.time(), result, job_id)
+        )
+
+
+def fail_job(job_id: str, error: str):
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE job_id = ?",
+            (time.time(), error, job_id)
+        )
+
+
+def get_job(job_id: str):
+    """
+    Job status as a dict, or None if unknown. The result is not included.
+    """
+
+    conn = _connect()
+    try:
+        row = conn.execute(
+            """
+            SELECT job_id, filename, status, owner_pid, owner_host,
+                   started_at, heartbeat_at, finished_at, error
+            FROM jobs WHERE job_id = ?
+            """,
+            (job_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    return dict(row) if row is not None else None
+
+
+def get_job_result(job_id: str):
+    """
+    Encoded JSON result of a finished job, or None.
+    """
+
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT result FROM jobs WHERE job_id = ? AND status = 'done' AND result IS NOT NULL",
+            (job_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    return row["result"] if row is not None else None
+
+
+# ==========================================
+# Global LLM Concurrency Cap
+# ==========================================
+
+def _renew_slot(slot_id: int, stop: threading.Event):
+    while not stop.wait(LLM_SLOT_LEASE / 3):
+        try:
+            with _transaction() as conn:
+                conn.execute(
+                    "UPDATE llm_slots SET expires_at = ? WHERE slot_id = ?",
+                    (time.time() + LLM_SLOT_LEASE, slot_id)
+                )
+        except sqlite3.Error as e:
+            log("LLM_ERROR", f"Slot lease renewal failed: {e}")
+
+
+def _slot_request_position(conn, request_id: int, rank: int, deadline_at, now: float):
+    """
+    Refresh this request's heartbeat and return how many waiting
+    requests are ahead of it.
+    """
+
+    # Waiters from crashed workers stop heartbeating and are removed
+    conn.execute(
+        "DELETE FROM slot_requests WHERE heartbeat_at < ?",
+        (now - SLOT_REQUEST_STALE,)
+    )
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO slot_requests
+            (request_id, rank, deadline_at, owner_pid, heartbeat_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (request_id, rank, deadline_at, os.getpid(), now)
+    )
+
+    return conn.execute(
+        """
+        SELECT COUNT(*) FROM slot_requests
+        WHERE rank < :rank
+           OR (rank = :rank AND COALESCE(deadline_at, 1e300) < COALESCE(:deadline, 1e300))
+           OR (rank = :rank AND COALESCE(deadline_at, 1e300) = COALESCE(:deadline, 1e300)
+               AND request_id < :request_id)
+        """,
+        {"rank": rank, "deadline": deadline_at, "request_id": request_id}
+    ).fetchone()[0]
+
+
+@contextmanager
+def llm_slot(priority: str = "interactive", deadline: float = None):
+    """
+    Hold one of LLM_GLOBAL_MAX_CONCURRENCY slots shared by all workers.
+
+    Waiting requests from every worker are granted in the scheduler's
+    order: priority class, then earliest deadline, then arrival.
+    deadline is a time.monotonic() value; DeadlineExceeded is raised if
+    it passes while waiting.
+
+    The lease is renewed while the slot is held, however long the call
+    takes; slots of crashed workers expire after LLM_SLOT_LEASE.
+    """
+
+    if LLM_GLOBAL_MAX_CONCURRENCY <= 0:
+        yield
+        return
+
+    rank = PRIORITY_CLASSES[priority]
+
+    # Monotonic clocks are per process; workers compare wall-clock time
+    deadline_at = None
+    if deadline is not None:
+        deadline_at = time.time() + (deadline - time.monotonic())
+
+    with _transaction() as conn:
+        request_id = conn.execute(
+            """
+            INSERT INTO slot_requests (rank, deadline_at, owner_pid, heartbeat_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            (rank, deadline_at, os.getpid(), time.time())
+        ).lastrowid
+
+    slot_id = None
+    waited = False
+
+    try:
+        while slot_id is None:
+            now = time.time()
+
+            if deadline_at is not None and now > deadline_at:
+                raise DeadlineExceeded("Deadline exceeded")
+
+            with _transaction() as conn:
+                conn.execute("DELETE FROM llm_slots WHERE expires_at < ?", (now,))
+                in_use = conn.execute("SELECT COUNT(*) FROM llm_slots").fetchone()[0]
+                ahead = _slot_request_position(conn, request_id, rank, deadline_at, now)
+
+                # Grant only to the first free-slot-count waiters in order
+                if ahead < LLM_GLOBAL_MAX_CONCURRENCY - in_use:
+                    slot_id = conn.execute(
+                        "INSERT INTO llm_slots (owner_pid, expires_at) VALUES (?, ?)",
+                        (os.getpid(), now + LLM_SLOT_LEASE)
+                    ).lastrowid
+                    conn.execute(
+                        "DELETE FROM slot_requests WHERE request_id = ?",
+                        (request_id,)
+                    )
+
+            if slot_id is None:
+                if not waited:
+                    log("LLM", f"Global LLM concurrency cap reached, {priority} call waiting")
+                    waited = True
+                time.sleep(SLOT_POLL_INTERVAL)
+
+    finally:
+        if slot_id is None:
+            with _transaction() as conn:
+                conn.execute(
+                    "DELETE FROM slot_requests WHERE request_id = ?",
+                    (request_id,)
+                )
+
+    stop = threading.Event()
+    renewer = threading.Thread(
+        target=_renew_slot,
+        args=(slot_id, stop),
+        name=f"llm-slot-{slot_id}",
+        daemon=True
+    )
+    renewer.start()
+
+    try:
+        yield
+    finally:
+        stop.set()
+        renewer.join()
+        with _transaction() as conn:
+            conn.execute("DELETE FROM llm_slots WHERE slot_id = ?", (slot_id,))
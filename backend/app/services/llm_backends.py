@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlsplit
+import requests
+from dotenv import load_dotenv
+from app.services.extraction_validator import DATE_PATTERN
+from app.services.token_budget import LLM_CTX_BUCKETS
+from app.utils.logger import log
+
+# ==========================================
+# Load Environment Variables
+# ==========================================
+
+load_dotenv()
+
+# ollama | openai | llamacpp | stub
+LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama").lower()
+
+# Comma separated endpoint URLs; OLLAMA_URL is used when unset
+LLM_ENDPOINTS = [
+    u.strip()
+    for u in (os.getenv("LLM_ENDPOINTS") or os.getenv("OLLAMA_URL") or "").split(",")
+    if u.strip()
+]
+
+LLM_HEALTH_TIMEOUT = float(os.getenv("LLM_HEALTH_TIMEOUT", "3"))
+LLM_HEALTH_COOLDOWN = float(os.getenv("LLM_HEALTH_COOLDOWN", "30"))
+
+# Consecutive 5xx responses before an endpoint is parked
+LLM_MAX_SERVER_ERRORS = int(os.getenv("LLM_MAX_SERVER_ERRORS", "3"))
+LLAMACPP_THREADS = int(os.getenv("LLAMACPP_THREADS", "0")) or None
+
+# Persistent session shared by all HTTP backends
+session = requests.Session()
+
+
+class LLMBackendError(Exception):
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+def _base_url(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+# ==========================================
+# Backends
+# ==========================================
+
+class LLMBackend:
+    """
+    One inference endpoint. chat() returns the assistant message text
+    and raises LLMBackendError on failure.
+    """
+
+    kind = "base"
+
+    def __init__(self, url: str = None):
+        self.url = url
+
+    @property
+    def label(self) -> str:
+        return f"{self.kind}:{self.url}" if self.url else self.kind
+
+    def chat(self, model, messages, num_ctx, num_predict, temperature, timeout) -> str:
+        raise NotImplementedError
+
+    def health_check(self) -> bool:
+        return True
+
+
+class OllamaBackend(LLMBackend):
+    """
+    Ollama /api/chat endpoint.
+    """
+
+    kind = "ollama"
+
+    def chat(self, model, messages, num_ctx, num_predict, temperature, timeout) -> str:
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "options": {
+                "temperature": temperature,
+                "num_ctx": num_ctx,
+                "num_predict": num_predict
+            }
+        }
+
+        response = session.post(self.url, json=payload, timeout=timeout)
+
+        if response.status_code != 200:
+            raise LLMBackendError(f"Status {response.status_code}", response.status_code)
+
+        return response.json().get("message", {}).get("content", "")
+
+    def health_check(self) -> bool:
+        try:
+            response = session.get(
+                f"{_base_url(self.url)}/api/tags",
+                timeout=LLM_HEALTH_TIMEOUT
+            )
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+
+class OpenAICompatBackend(LLMBackend):
+    """
+    OpenAI-compatible /v1/chat/completions endpoint
+    (llama.cpp server, vLLM, LM Studio). The context size is
+    fixed by the server, so num_ctx is not sent.
+    """
+
+    kind = "openai"
+
+    def chat(self, model, messages, num_ctx, num_predict, temperature, timeout) -> str:
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "temperature": temperature,
+            "max_tokens": num_predict
+        }
+
+        response = session.post(self.url, json=payload, timeout=timeout)
+
+        if response.status_code != 200:
+            raise LLMBackendError(f"Status {response.status_code}", response.status_code)
+
+        choices = response.json().get("choices") or [{}]
+        return choices[0].get("message", {}).get("content", "")
+
+    def health_check(self) -> bool:
+        try:
+            response = session.get(
+                f"{_base_url(self.url)}/v1/models",
+                timeout=LLM_HEALTH_TIMEOUT
+            )
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+
+class LlamaCppBackend(LLMBackend):
+    """
+    In-process llama-cpp-python. The model name is the GGUF path.
+    Loaded models are cached and calls to one model are serialized.
+    """
+
+    kind = "llamacpp"
+
+    def __init__(self, url: str = None):
+        super().__init__(url)
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _load(self, model_path: str):
+        with self._lock:
+            if model_path not in self._models:
+                try:
+                    from llama_cpp import Llama
+                except ImportError as e:
+                    raise LLMBackendError("llama-cpp-python is not installed") from e
+
+                log("LLM", f"Loading {model_path}")
+                llm = Llama(
+                    model_path=model_path,
+                    n_ctx=LLM_CTX_BUCKETS[-1],
+                    n_threads=LLAMACPP_THREADS,
+                    verbose=False
+                )
+                self._models[model_path] = (llm, threading.Lock())
+
+            return self._models[model_path]
+
+    def chat(self, model, messages, num_ctx, num_predict, temperature, timeout) -> str:
+
+        llm, lock = self._load(model)
+
+        with lock:
+            output = llm.create_chat_completion(
+                messages=messages,
+                temperature=temperature,
+                max_tokens=num_predict
+            )
+
+        return output["choices"][0]["message"]["content"]
+
+
+class StubBackend(LLMBackend):
+    """
+    Local backend for tests. Answers instantly with a deterministic
+    JSON built from the record text; no model is needed.
+    """
+
+    kind = "stub"
+
+    def chat(self, model, messages, num_ctx, num_predict, temperature, timeout) -> str:
+
+        text = messages[-1]["content"]
+        lines = [l.strip() for l in text.strip().splitlines() if l.strip()]
+        record = lines[1:-1] or lines
+        body = " ".join(record)
+
+        date_match = DATE_PATTERN.search(body)
+
+        return json.dumps({
+            "date": date_match.group() if date_match else None,
+            "heading": record[0][:80] if record else None,
+            "input_summary": body[:300] or None
+        })
+
+
+BACKENDS = {
+    "ollama": OllamaBackend,
+    "openai": OpenAICompatBackend,
+    "llamacpp": LlamaCppBackend,
+    "stub": StubBackend
+}
+
+# ==========================================
+# Router (least outstanding requests)
+# ==========================================
+
+class _Endpoint:
+
+    def __init__(self, backend: LLMBackend):
+        self.backend = backend
+        self.in_flight = 0
+        self.healthy = True
+        self.retry_at = 0.0
+        self.server_errors = 0
+
+
+def _failure_weight(error: Exception) -> int:
+    """
+    How much an error says about the endpoint itself.
+    Connection failures park it at once; 5xx responses count towards
+    LLM_MAX_SERVER_ERRORS. Read timeouts, 4xx (e.g. a model that is not
+    pulled) and bad bodies are about the request, not the endpoint.
+    """
+
+    # ConnectTimeout is a ConnectionError; ReadTimeout is not
+    if isinstance(error, requests.ConnectionError):
+        return LLM_MAX_SERVER_ERRORS
+
+    if isinstance(error, LLMBackendError) and error.status is not None and error.status >= 500:
+        return 1
+
+    return 0
+
+
+class LLMRouter:
+    """
+    Spreads calls over several backends. Each call goes to the healthy
+    endpoint with the fewest requests in flight. Failed endpoints are
+    taken out for LLM_HEALTH_COOLDOWN seconds and must pass a health
+    check before they are used again. The last healthy endpoint is
+    never taken out.
+    """
+
+    def __init__(self, backends: list):
+        if not backends:
+            raise ValueError("LLM router needs at least one backend")
+
+        self._lock = threading.Lock()
+        self._endpoints = [_Endpoint(b) for b in backends]
+
+    def _candidates(self, tried: set) -> tuple:
+        now = time.monotonic()
+        with self._lock:
+            ready = [e for e in self._endpoints if e not in tried and e.healthy]
+            recovering = [
+                e for e in self._endpoints
+                if e not in tried and not e.healthy and e.retry_at <= now
+            ]
+        return ready, recovering
+
+    def _acquire(self, tried: set):
+        ready, recovering = self._candidates(tried)
+
+        # Re-admit endpoints whose cooldown has expired
+        for endpoint in recovering:
+            if endpoint.backend.health_check():
+                log("LLM", f"Endpoint {endpoint.backend.label} back online")
+                with self._lock:
+                    endpoint.healthy = True
+                ready.append(endpoint)
+            else:
+                with self._lock:
+                    endpoint.retry_at = time.monotonic() + LLM_HEALTH_COOLDOWN
+
+        if not ready:
+            return None
+
+        with self._lock:
+            endpoint = min(ready, key=lambda e: e.in_flight)
+            endpoint.in_flight += 1
+        return endpoint
+
+    def _release(self, endpoint: _Endpoint, error: Exception = None):
+        with self._lock:
+            endpoint.in_flight -= 1
+
+            if error is None:
+                endpoint.server_errors = 0
+                return
+
+            endpoint.server_errors += _failure_weight(error)
+            if endpoint.server_errors < LLM_MAX_SERVER_ERRORS or not endpoint.healthy:
+                return
+
+            others_healthy = any(
+                e.healthy for e in self._endpoints if e is not endpoint
+            )
+            if not others_healthy:
+                return
+
+            endpoint.healthy = False
+            endpoint.server_errors = 0
+            endpoint.retry_at = time.monotonic() + LLM_HEALTH_COOLDOWN
+
+        log("LLM", f"Endpoint {endpoint.backend.label} parked for {LLM_HEALTH_COOLDOWN}s")
+
+    def chat(self, model, messages, num_ctx, num_predict, temperature, timeout) -> str:
+        """
+        Send a chat request, failing over to the next endpoint on error.
+        """
+
+        tried = set()
+        last_error = None
+
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                break
+
+            tried.add(endpoint)
+
+            try:
+                content = endpoint.backend.chat(
+                    model, messages, num_ctx, num_predict, temperature, timeout
+                )
+            except Exception as e:
+                self._release(endpoint, e)
+                log("LLM_ERROR", f"{endpoint.backend.label} failed: {e}")
+                last_error = e
+                continue
+
+            self._release(endpoint)
+            return content
+
+        raise LLMBackendError(f"No LLM endpoint available (last error: {last_error})")
+
+    def status(self) -> list:
+        with self._lock:
+            return [
+                {
+                    "endpoint": e.backend.label,
+                    "healthy": e.healthy,
+                    "in_flight": e.in_flight
+                }
+                for e in self._endpoints
+            ]
+
+
+def build_router() -> LLMRouter:
+    """
+    Router for LLM_BACKEND over LLM_ENDPOINTS.
+    """
+
+    backend_cls = BACKENDS.get(LLM_BACKEND)
+
+    if backend_cls is None:
+        raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}")
+
+    # In-process and stub backends have no endpoint URL
+    if backend_cls in (LlamaCppBackend, StubBackend):
+        return LLMRouter([backend_cls()])
+
+    if not LLM_ENDPOINTS:
+        raise ValueError("LLM_ENDPOINTS or OLLAMA_URL not set in .env")
+
+    log("LLM", f"{LLM_BACKEND} backend with {len(LLM_ENDPOINTS)} endpoint(s)")
+    return LLMRouter([backend_cls(url) for url in LLM_ENDPOINTS])
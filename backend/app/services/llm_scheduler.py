@@ -0,0 +1,213 @@
+import time
+import heapq
+import itertools
+import threading
+from app.utils.logger import log
+
+# ==========================================
+# Priority Classes
+# ==========================================
+
+# Lower rank runs first
+PRIORITY_CLASSES = {
+    "interactive": 0,
+    "bulk": 1
+}
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+_current = threading.local()
+
+
+def current_job():
+    """
+    The BatchJob whose block this thread is running, or None outside
+    scheduler workers. Lets the LLM call carry the job's priority and
+    deadline without threading them through every function.
+    """
+
+    return getattr(_current, "job", None)
+
+
+# ==========================================
+# Batch Job
+# ==========================================
+
+class BatchJob:
+    """
+    The blocks of one upload. Each block is queued separately, so
+    higher-priority work can run between any two blocks of this job.
+    """
+
+    def __init__(self, size: int, priority: str, deadline):
+        self.priority = priority
+        self.deadline = deadline  # time.monotonic() value or None
+        self.results = [None] * size
+        self.queue_waits = []
+        self._remaining = size
+        self._error = None
+        self._done = threading.Event()
+
+        if size == 0:
+            self._done.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._error is not None
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def cancel(self, error: Exception):
+        if self._error is None:
+            self._error = error
+        self._done.set()
+
+    def _finish(self, idx: int, result):
+        self.results[idx] = result
+        self._remaining -= 1
+        if self._remaining == 0:
+            self._done.set()
+
+    def wait(self) -> list:
+        """
+        Block until all results are in. Raises DeadlineExceeded when
+        the deadline passes first; queued blocks are then dropped.
+        """
+
+        timeout = None
+        if self.deadline is not None:
+            timeout = max(0.0, self.deadline - time.monotonic())
+
+        if not self._done.wait(timeout):
+            self.cancel(DeadlineExceeded("Deadline exceeded"))
+
+        if self._error is not None:
+            raise self._error
+
+        return self.results
+
+
+# ==========================================
+# Scheduler
+# ==========================================
+
+class LLMScheduler:
+    """
+    One queue of LLM work shared by all uploads in this process.
+    Blocks run by priority class, then earliest deadline, then
+    submission order.
+    """
+
+    def __init__(self, workers: int):
+        self._workers = workers
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._started = False
+        self._wait_stats = {
+            name: {"blocks": 0, "total_wait_s": 0.0, "max_wait_s": 0.0, "dropped": 0}
+            for name in PRIORITY_CLASSES
+        }
+
+    def _start(self):
+        # Threads start on first use, not at import time
+        for i in range(self._workers):
+            threading.Thread(
+                target=self._worker,
+                name=f"llm-worker-{i}",
+                daemon=True
+            ).start()
+        self._started = True
+
+    def submit(self, blocks: list, fn, priority: str = "interactive", deadline=None) -> BatchJob:
+        """
+        Queue fn(block) for every block. deadline is a time.monotonic() value.
+        """
+
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority {priority!r}")
+
+        job = BatchJob(len(blocks), priority, deadline)
+        rank = PRIORITY_CLASSES[priority]
+        order = deadline if deadline is not None else float("inf")
+        now = time.monotonic()
+
+        with self._available:
+            if not self._started:
+                self._start()
+
+            for idx, block in enumerate(blocks):
+                heapq.heappush(
+                    self._heap,
+                    (rank, order, next(self._seq), now, job, idx, block, fn)
+                )
+
+            self._available.notify_all()
+
+        return job
+
+    def _worker(self):
+        while True:
+            with self._available:
+                while not self._heap:
+                    self._available.wait()
+                _, _, _, queued_at, job, idx, block, fn = heapq.heappop(self._heap)
+
+            if not job.cancelled and job.expired():
+                log("SCHEDULER", f"Deadline passed, cancelling {job.priority} job")
+                job.cancel(DeadlineExceeded("Deadline exceeded"))
+
+            # Remaining blocks of cancelled jobs are dropped unprocessed
+            if job.cancelled:
+                self._record_dropped(job.priority)
+                continue
+
+            waited = time.monotonic() - queued_at
+            self._record_wait(job, waited)
+
+            _current.job = job
+            try:
+                result = fn(block)
+            except Exception as e:
+                job.cancel(e)
+                continue
+            finally:
+                _current.job = None
+
+            with self._lock:
+                job._finish(idx, result)
+
+    def _record_wait(self, job: BatchJob, waited: float):
+        with self._lock:
+            entry = self._wait_stats[job.priority]
+            entry["blocks"] += 1
+            entry["total_wait_s"] += waited
+            entry["max_wait_s"] = max(entry["max_wait_s"], waited)
+            job.queue_waits.append(waited)
+
+    def _record_dropped(self, priority: str):
+        with self._lock:
+            self._wait_stats[priority]["dropped"] += 1
+
+    def stats(self) -> dict:
+        """
+        Queue-wait totals per priority class since start-up.
+        """
+
+        with self._lock:
+            summary = {}
+            for name, entry in self._wait_stats.items():
+                blocks = entry["blocks"]
+                summary[name] = {
+                    "blocks": blocks,
+                    "dropped_blocks": entry["dropped"],
+                    "queued": sum(1 for item in self._heap if item[4].priority == name),
+                    "avg_wait_s": round(entry["total_wait_s"] / blocks, 3) if blocks else 0.0,
+                    "max_wait_s": round(entry["max_wait_s"], 3)
+                }
+            return summary
@@ -1,8 +1,26 @@
-import requests
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import time
+import threading
 from dotenv import load_dotenv
+from app.services.token_budget import (
+    LLM_CTX_BUCKETS,
+    LLM_MAX_PREDICT,
+    LLM_TOKENIZER,
+    LLM_ESTIMATE_MARGIN,
+    count_tokens,
+    plan_request,
+    plan_chunks
+)
+from app.services.extraction_validator import (
+    LLM_CASCADE_MAX_NULL_RATIO,
+    validate_extraction
+)
+from app.services.llm_backends import LLM_BACKEND, build_router
+from app.services.job_store import llm_slot
+from app.services.llm_scheduler import LLMScheduler, DeadlineExceeded, current_job
+from app.schemas.semantic_schema import record_from_dict
 from app.utils.logger import log
 
 # ==========================================
@@ -11,20 +29,19 @@ from app.utils.logger import log
 
 load_dotenv()
 
-OLLAMA_URL = os.getenv("OLLAMA_URL")
 LLM_MODEL = os.getenv("LLM_MODEL")
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL")  # Optional fast first tier
 LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "35"))
 LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "4"))
-LLM_MAX_TEXT_LENGTH = int(os.getenv("LLM_MAX_TEXT_LENGTH", "2000"))
-
-if not OLLAMA_URL:
-    raise ValueError("OLLAMA_URL not set in .env")
 
 if not LLM_MODEL:
     raise ValueError("LLM_MODEL not set in .env")
 
-# Persistent session
-session = requests.Session()
+# Backend router (Ollama, OpenAI-compatible, llama.cpp or stub)
+router = build_router()
+
+# Process-wide LLM work queue shared by all uploads
+scheduler = LLMScheduler(LLM_MAX_WORKERS)
 
 # ==========================================
 # SYSTEM PROMPT
@@ -194,60 +211,95 @@ SCHEMA = {
 }
 
 # ==========================================
-# Single Block Extraction
+# User Prompt Template
 # ==========================================
 
-def extract_semantic_fields(text: str) -> dict:
-
-    if not text or len(text.strip()) < 10:
-        return SCHEMA.copy()
-
-    if len(text) > LLM_MAX_TEXT_LENGTH:
-        text = text[:LLM_MAX_TEXT_LENGTH]
-
-    payload = {
-        "model": LLM_MODEL,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": f"""
+USER_PROMPT = """
 Extract structured military intelligence fields from the following report:
 
 {text}
 
 Return ONLY valid JSON with the 19 required fields.
 """
-            }
-        ],
-        "stream": False,
-        "options": {
-            "temperature": 0.1,
-            "num_ctx": 4096,
-            "num_predict": 700
-        }
-    }
 
-    try:
-        response = session.post(
-            OLLAMA_URL,
-            json=payload,
-            timeout=LLM_TIMEOUT
-        )
+# Everything that changes the extraction output for the same PDF.
+# Part of the job key so cached results are not served after a change.
+CONFIG_FINGERPRINT = hashlib.sha256("\x00".join([
+    LLM_BACKEND,
+    LLM_MODEL,
+    LLM_SMALL_MODEL or "",
+    SYSTEM_PROMPT,
+    USER_PROMPT,
+    ",".join(str(b) for b in LLM_CTX_BUCKETS),
+    str(LLM_MAX_PREDICT),
+    LLM_TOKENIZER or "",
+    str(LLM_ESTIMATE_MARGIN),
+    str(LLM_CASCADE_MAX_NULL_RATIO)
+]).encode("utf-8")).hexdigest()
+
+# Tokens used by everything except the record text (plus chat template)
+PROMPT_OVERHEAD = (
+    count_tokens(SYSTEM_PROMPT)
+    + count_tokens(USER_PROMPT.format(text=""))
+    + 16
+)
+
+
+def _fill_schema(parsed: dict) -> dict:
+    """
+    Ensure all keys exist.
+    """
+
+    for key in SCHEMA:
+        parsed.setdefault(key, None)
+
+    return parsed
+
+
+def _fallback(text: str) -> dict:
+    fallback = SCHEMA.copy()
+    fallback["input_summary"] = text[:300]
+    return fallback
+
+
+# ==========================================
+# LLM Call
+# ==========================================
+
+def _call_llm(text: str, model: str, num_ctx: int, num_predict: int):
+    """
+    Send one record to the LLM. Returns parsed JSON or None.
+    """
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_PROMPT.format(text=text)}
+    ]
+
+    # Stop a running block once its upload has timed out or failed,
+    # rather than finishing every tier and chunk for nobody
+    job = current_job()
+    if job is not None and (job.cancelled or job.expired()):
+        raise DeadlineExceeded("Job cancelled or deadline exceeded")
 
-        if response.status_code != 200:
-            log("LLM_ERROR", f"Status {response.status_code}")
-            fallback = SCHEMA.copy()
-            fallback["input_summary"] = text[:300]
-            return fallback
+    # Shared cap across workers, granted in priority/deadline order
+    priority = job.priority if job is not None else "interactive"
+    deadline = job.deadline if job is not None else None
 
-        raw_output = response.json().get("message", {}).get("content", "")
+    try:
+        with llm_slot(priority, deadline):
+            raw_output = router.chat(
+                model,
+                messages,
+                num_ctx=num_ctx,
+                num_predict=num_predict,
+                temperature=0.1,
+                timeout=LLM_TIMEOUT
+            )
 
         if not raw_output:
             log("LLM_ERROR", "Empty response")
-            fallback = SCHEMA.copy()
-            fallback["input_summary"] = text[:300]
-            return fallback
+            return None
 
         # Extract JSON safely
         start = raw_output.find("{")
@@ -255,47 +307,233 @@ Return ONLY valid JSON with the 19 required fields.
 
         if start == -1 or end == -1:
             log("LLM_ERROR", "Invalid JSON format from LLM")
-            fallback = SCHEMA.copy()
-            fallback["input_summary"] = text[:300]
-            return fallback
-
-        parsed = json.loads(raw_output[start:end + 1])
+            return None
 
-        # Ensure all keys exist
-        for key in SCHEMA:
-            parsed.setdefault(key, None)
+        # Returned as the model wrote it; missing keys are filled in by
+        # _fill_schema only after validation has seen them
+        return json.loads(raw_output[start:end + 1])
 
-        return parsed
+    except DeadlineExceeded:
+        raise
 
     except Exception as e:
         log("LLM_ERROR", str(e))
-        fallback = SCHEMA.copy()
-        fallback["input_summary"] = text[:300]
-        return fallback
+        return None
+
+
+# ==========================================
+# Chunk Merging
+# ==========================================
+
+def _merge_chunks(parts: list) -> dict:
+    """
+    Combine per-chunk extractions of one oversized record.
+    First non-null value wins; summaries are concatenated.
+    """
+
+    # Keys no chunk returned stay missing, for validation
+    merged = {}
+    summaries = []
+
+    for part in parts:
+        for key in SCHEMA:
+            if key not in part:
+                continue
+            value = part[key]
+            if value in (None, ""):
+                merged.setdefault(key, None)
+            elif key == "input_summary":
+                summaries.append(str(value))
+            elif merged.get(key) is None:
+                merged[key] = value
+
+    if summaries:
+        merged["input_summary"] = " ".join(summaries)
+
+    return merged
+
+
+# ==========================================
+# Tier Statistics
+# ==========================================
+
+class TierStats:
+    """
+    Per-tier call counts and latencies for one batch of blocks,
+    plus the time its blocks waited in the scheduler queue.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {}
+        self.escalated = 0
+        self.failed = 0
+        self.queue = None
+
+    def record(self, tier: str, seconds: float, accepted: bool):
+        with self._lock:
+            entry = self._tiers.setdefault(
+                tier, {"calls": 0, "accepted": 0, "total_latency_s": 0.0}
+            )
+            entry["calls"] += 1
+            entry["accepted"] += int(accepted)
+            entry["total_latency_s"] += seconds
+
+    def mark_escalated(self):
+        with self._lock:
+            self.escalated += 1
+
+    def mark_failed(self):
+        with self._lock:
+            self.failed += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            tiers = {}
+            for tier, entry in self._tiers.items():
+                tiers[tier] = {
+                    "calls": entry["calls"],
+                    "accepted": entry["accepted"],
+                    "total_latency_s": round(entry["total_latency_s"], 2),
+                    "avg_latency_s": round(entry["total_latency_s"] / entry["calls"], 2)
+                }
+            summary = {
+                "tiers": tiers,
+                "escalated": self.escalated,
+                "failed_blocks": self.failed
+            }
+            if self.queue is not None:
+                summary["queue"] = self.queue
+            return summary
+
+
+# ==========================================
+# Single Model Extraction
+# ==========================================
+
+def _extract_with_model(text: str, model: str):
+    """
+    Extract one block with one model, chunking it if it does not
+    fit the largest context bucket.
+
+    Returns (parsed JSON or None, complete). complete is False when
+    any LLM call for the block failed.
+    """
+
+    plan = plan_request(text, PROMPT_OVERHEAD)
+
+    if plan is not None:
+        num_ctx, num_predict = plan
+        parsed = _call_llm(text, model, num_ctx, num_predict)
+        return parsed, parsed is not None
+
+    # Oversized record: extract each chunk and merge
+    chunks = plan_chunks(text, PROMPT_OVERHEAD)
+    log("LLM", f"Record too large for context, split into {len(chunks)} chunks")
+
+    parts = []
+    for chunk, num_ctx, num_predict in chunks:
+        parsed = _call_llm(chunk, model, num_ctx, num_predict)
+        if parsed is not None:
+            parts.append(parsed)
+
+    if not parts:
+        return None, False
+
+    return _merge_chunks(parts), len(parts) == len(chunks)
+
+
+# ==========================================
+# Single Block Extraction (Model Cascade)
+# ==========================================
+
+def extract_semantic_fields(text: str, stats: TierStats = None) -> dict:
+    """
+    Extract one block. When LLM_SMALL_MODEL is set the small model runs
+    first and only blocks failing validation go to LLM_MODEL.
+    Blocks that end without a complete LLM answer are counted as failed
+    in stats.
+    """
+
+    if not text or len(text.strip()) < 10:
+        return SCHEMA.copy()
+
+    small_result = None
+
+    if LLM_SMALL_MODEL:
+        start = time.perf_counter()
+        small_result, small_complete = _extract_with_model(text, LLM_SMALL_MODEL)
+        reasons = validate_extraction(small_result, text)
+        if not small_complete:
+            reasons.append("incomplete extraction")
+
+        if stats is not None:
+            stats.record("small", time.perf_counter() - start, not reasons)
+
+        if not reasons:
+            return _fill_schema(small_result)
+
+        log("CASCADE", f"Escalating to {LLM_MODEL}: {'; '.join(reasons)}")
+        if stats is not None:
+            stats.mark_escalated()
+
+    start = time.perf_counter()
+    parsed, complete = _extract_with_model(text, LLM_MODEL)
+
+    if stats is not None:
+        stats.record("large", time.perf_counter() - start, complete)
+        if not complete:
+            stats.mark_failed()
+
+    if parsed is not None:
+        return _fill_schema(parsed)
+
+    # Large model failed outright; a low-confidence answer beats none
+    if small_result is not None:
+        return _fill_schema(small_result)
+
+    return _fallback(text)
 
 
 # ==========================================
 # Parallel Processing
 # ==========================================
 
-def extract_multiple_blocks_parallel(blocks: list) -> list:
+def extract_multiple_blocks_parallel(
+    blocks: list,
+    stats: TierStats = None,
+    priority: str = "interactive",
+    deadline: float = None
+) -> list:
+    """
+    Extract all blocks through the shared scheduler. Results are compact
+    IntelRecord instances in block order.
+
+    deadline is a time.monotonic() value; past it the remaining blocks
+    are dropped and DeadlineExceeded is raised.
+    """
 
     if not blocks:
         return []
 
-    results = [None] * len(blocks)
+    log("PROCESS", f"Queueing {len(blocks)} {priority} blocks for LLM")
 
-    log("PROCESS", f"Sending {len(blocks)} blocks to LLM")
+    job = scheduler.submit(
+        blocks,
+        lambda block: record_from_dict(extract_semantic_fields(block, stats)),
+        priority=priority,
+        deadline=deadline
+    )
 
-    with ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS) as executor:
+    results = job.wait()
 
-        futures = {
-            executor.submit(extract_semantic_fields, block): i
-            for i, block in enumerate(blocks)
+    if stats is not None:
+        waits = job.queue_waits
+        stats.queue = {
+            "priority": priority,
+            "avg_wait_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "max_wait_s": round(max(waits), 3) if waits else 0.0
         }
+        log("CASCADE", f"Tier summary → {stats.summary()}")
 
-        for future in as_completed(futures):
-            idx = futures[future]
-            results[idx] = future.result()
-
-    return results
\ No newline at end of file
+    return results
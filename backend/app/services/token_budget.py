@@ -0,0 +1,231 @@
+import os
+import json
+from dotenv import load_dotenv
+from app.schemas.semantic_schema import SEMANTIC_SCHEMA
+from app.utils.logger import log
+
+# ==========================================
+# Load Environment Variables
+# ==========================================
+
+load_dotenv()
+
+# Context window sizes the model is allowed to run with.
+# A small fixed set keeps Ollama from reloading the model on every size change.
+LLM_CTX_BUCKETS = sorted(
+    int(x) for x in os.getenv("LLM_CTX_BUCKETS", "2048,4096,8192").split(",") if x.strip()
+)
+LLM_MAX_PREDICT = int(os.getenv("LLM_MAX_PREDICT", "700"))
+LLM_CTX_MARGIN = int(os.getenv("LLM_CTX_MARGIN", "64"))
+LLM_CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "3.5"))
+
+# Extra headroom when counts are estimated: numbers and abbreviations
+# tokenize denser than LLM_CHARS_PER_TOKEN suggests
+LLM_ESTIMATE_MARGIN = float(os.getenv("LLM_ESTIMATE_MARGIN", "0.15"))
+
+# HuggingFace tokenizer name (e.g. Qwen/Qwen2.5-Coder-32B-Instruct) or a
+# local tokenizer.json path, used for exact counts. Falls back to a
+# character estimate when unset or unavailable.
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER")
+
+if not LLM_CTX_BUCKETS:
+    raise ValueError("LLM_CTX_BUCKETS must list at least one context size")
+
+# Tokens reserved per non-null value and for the summary field
+FIELD_VALUE_TOKENS = 12
+SUMMARY_MAX_TOKENS = 250
+
+# ==========================================
+# Tokenizer
+# ==========================================
+
+_tokenizer = None
+
+if LLM_TOKENIZER:
+    try:
+        from tokenizers import Tokenizer
+        if os.path.isfile(LLM_TOKENIZER):
+            _tokenizer = Tokenizer.from_file(LLM_TOKENIZER)
+        else:
+            _tokenizer = Tokenizer.from_pretrained(LLM_TOKENIZER)
+        log("TOKENS", f"Using tokenizer {LLM_TOKENIZER}")
+    except Exception as e:
+        log("TOKENS", f"Tokenizer unavailable ({e}), using estimate")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Number of tokens the model will see for text.
+    """
+
+    if not text:
+        return 0
+
+    if _tokenizer is not None:
+        return len(_tokenizer.encode(text, add_special_tokens=False).ids)
+
+    return int(len(text) / LLM_CHARS_PER_TOKEN) + 1
+
+
+def _with_margin(tokens: int) -> int:
+    """
+    Tokens to reserve for a count, including the safety margin.
+    """
+
+    if _tokenizer is None:
+        tokens = int(tokens * (1 + LLM_ESTIMATE_MARGIN))
+
+    return tokens + LLM_CTX_MARGIN
+
+
+# Size of an all-null JSON answer with the 19 keys
+JSON_SKELETON_TOKENS = count_tokens(json.dumps(SEMANTIC_SCHEMA, indent=2))
+
+# ==========================================
+# Budget Planning
+# ==========================================
+
+def estimate_num_predict(input_tokens: int) -> int:
+    """
+    Output budget for one record: JSON skeleton, short values for
+    every field and a summary proportional to the input.
+    """
+
+    summary = min(SUMMARY_MAX_TOKENS, input_tokens // 2)
+    expected = JSON_SKELETON_TOKENS + FIELD_VALUE_TOKENS * len(SEMANTIC_SCHEMA) + summary
+
+    return min(LLM_MAX_PREDICT, expected)
+
+
+def select_num_ctx(required_tokens: int):
+    """
+    Smallest context bucket that fits required_tokens, or None.
+    """
+
+    for bucket in LLM_CTX_BUCKETS:
+        if _with_margin(required_tokens) <= bucket:
+            return bucket
+
+    return None
+
+
+def plan_request(text: str, prompt_overhead: int):
+    """
+    Returns (num_ctx, num_predict) for text, or None when the
+    record does not fit the largest bucket and must be chunked.
+    """
+
+    input_tokens = count_tokens(text)
+    num_predict = estimate_num_predict(input_tokens)
+    num_ctx = select_num_ctx(prompt_overhead + input_tokens + num_predict)
+
+    if num_ctx is None:
+        return None
+
+    return num_ctx, num_predict
+
+
+def max_chunk_tokens(prompt_overhead: int) -> int:
+    """
+    Largest input that still fits the biggest bucket.
+    """
+
+    available = LLM_CTX_BUCKETS[-1] - LLM_CTX_MARGIN
+
+    if _tokenizer is None:
+        available = int(available / (1 + LLM_ESTIMATE_MARGIN))
+
+    return available - prompt_overhead - LLM_MAX_PREDICT
+
+
+def _cut_line(line: str, max_tokens: int) -> list[str]:
+    """
+    Cut one overlong line by characters. Token density varies along a
+    line, so each piece is measured and shortened until it fits.
+    """
+
+    pieces = []
+
+    while line:
+        tokens = count_tokens(line)
+        if tokens <= max_tokens:
+            pieces.append(line)
+            break
+
+        step = max(1, int(len(line) * max_tokens / tokens))
+        while step > 1 and count_tokens(line[:step]) > max_tokens:
+            step = max(1, int(step * 0.9))
+
+        pieces.append(line[:step])
+        line = line[step:]
+
+    return pieces
+
+
+def split_by_tokens(text: str, max_tokens: int) -> list[str]:
+    """
+    Split text on line boundaries into chunks of at most max_tokens.
+    Each line separator is counted as one token. Lines longer than the
+    limit are cut by characters.
+    """
+
+    if max_tokens <= 0:
+        raise ValueError("Prompt overhead exceeds the largest context bucket")
+
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for line in text.split("\n"):
+
+        line_tokens = count_tokens(line)
+
+        if line_tokens > max_tokens:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+
+            chunks.extend(_cut_line(line, max_tokens))
+            continue
+
+        separator = 1 if current else 0
+
+        if current_tokens + separator + line_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens, separator = [], 0, 0
+
+        current.append(line)
+        current_tokens += separator + line_tokens
+
+    if current:
+        chunks.append("\n".join(current))
+
+    return [c for c in chunks if c.strip()]
+
+
+def plan_chunks(text: str, prompt_overhead: int) -> list[tuple]:
+    """
+    Split an oversized record into (chunk, num_ctx, num_predict) items.
+    Every chunk is checked with plan_request on its joined text; one
+    that still does not fit (per-line counts undershoot with some
+    tokenizers) is split again in halves.
+    """
+
+    planned = []
+    pending = split_by_tokens(text, max_chunk_tokens(prompt_overhead))
+
+    while pending:
+        chunk = pending.pop(0)
+        plan = plan_request(chunk, prompt_overhead)
+
+        if plan is not None:
+            planned.append((chunk, *plan))
+            continue
+
+        pieces = split_by_tokens(chunk, max(1, count_tokens(chunk) // 2))
+        if len(pieces) < 2:
+            raise ValueError("Record chunk cannot be split to fit the context")
+
+        pending[:0] = pieces
+
+    return planned
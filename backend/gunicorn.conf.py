@@ -0,0 +1,11 @@
+# Production serving on Linux: gunicorn -c gunicorn.conf.py run:app
+# Workers share job state and the LLM cap through JOB_DB_PATH.
+import os
+
+# Workers inherit this; it turns on the global LLM cap
+os.environ.setdefault("SERVE_MODE", "production")
+
+bind = "0.0.0.0:5000"
+workers = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("WEB_TIMEOUT", "1800"))
@@ -1,12 +1,26 @@
+import os
 from app.app import create_app
 
 app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        "run:app",
-        host="0.0.0.0",
-        port=5000,
-        reload=True
-    )
+
+    # development: single process with auto-reload
+    # production: WEB_WORKERS processes sharing the SQLite job registry
+    SERVE_MODE = os.getenv("SERVE_MODE", "development").lower()
+
+    if SERVE_MODE == "production":
+        uvicorn.run(
+            "run:app",
+            host="0.0.0.0",
+            port=5000,
+            workers=int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+        )
+    else:
+        uvicorn.run(
+            "run:app",
+            host="0.0.0.0",
+            port=5000,
+            reload=True
+        )
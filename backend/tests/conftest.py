@@ -0,0 +1,45 @@
+import os
+import re
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# Modules read their configuration at import time, so the test
+# environment is set before any app module is imported.
+# load_dotenv() does not override variables that are already set.
+os.environ["LLM_BACKEND"] = "stub"
+os.environ["LLM_MODEL"] = "stub-large"
+os.environ["LLM_SMALL_MODEL"] = ""
+os.environ["LLM_TOKENIZER"] = ""
+os.environ["LLM_MAX_WORKERS"] = "2"
+os.environ["LLM_GLOBAL_MAX_CONCURRENCY"] = "0"
+os.environ["JOB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.db")
+
+
+class WordTokenizer:
+    """
+    Stand-in for a real tokenizer: one token per word, punctuation
+    mark and newline, newline_cost tokens per newline.
+    """
+
+    def __init__(self, newline_cost: int = 1):
+        self.newline_cost = newline_cost
+
+    def encode(self, text, add_special_tokens=False):
+        ids = re.findall(r"\w+|[^\w\s]", text)
+        ids += ["\n"] * (text.count("\n") * self.newline_cost)
+        return SimpleNamespace(ids=ids)
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    """
+    Makes token_budget count with WordTokenizer instead of the estimate.
+    """
+
+    from app.services import token_budget
+
+    def use(newline_cost=1):
+        monkeypatch.setattr(token_budget, "_tokenizer", WordTokenizer(newline_cost))
+    return use
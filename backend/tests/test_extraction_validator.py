@@ -0,0 +1,84 @@
+import pytest
+
+from app.schemas.semantic_schema import SEMANTIC_SCHEMA
+from app.services.extraction_validator import find_regex_fields, validate_extraction
+
+TEXT = "On 12 Jan 24 seven to 8 cadres of NSCN(IM) under SS Maj Konyak moved near Mon with AK rifles"
+
+
+def _record(**values):
+    record = dict(SEMANTIC_SCHEMA)
+    record.update(
+        date="12 Jan 24",
+        gp="NSCN(IM)",
+        heading="Movement of cadres",
+        input_summary="Cadres moved near Mon",
+        gen_area="Mon",
+        leader="SS Maj Konyak",
+        weapons="AK rifles",
+        engagement_type_reasoned="Movement",
+        cadres_min=7,
+        cadres_max=8
+    )
+    record.update(values)
+    return record
+
+
+def test_consistent_record_passes():
+    assert validate_extraction(_record(), TEXT) == []
+
+
+def test_list_engagement_type_fails_without_raising():
+    reasons = validate_extraction(_record(engagement_type_reasoned=["Movement"]), TEXT)
+
+    assert any("engagement type" in r for r in reasons)
+
+
+def test_cadre_count_not_in_text_fails():
+    reasons = validate_extraction(_record(cadres_max=40), TEXT)
+
+    assert "cadre count 40 not found in text" in reasons
+
+
+def test_missing_date_found_by_regex_fails():
+    reasons = validate_extraction(_record(date=None), TEXT)
+
+    assert "date present in text but not extracted" in reasons
+
+
+def test_mostly_null_record_fails():
+    reasons = validate_extraction(dict(SEMANTIC_SCHEMA, heading="x"), "no dates here")
+
+    assert any("fields null" in r for r in reasons)
+
+
+def test_non_dict_fails():
+    assert validate_extraction(None, TEXT) == ["not a JSON object"]
+
+
+def test_missing_keys_fail():
+    record = _record()
+    del record["weapons"]
+
+    assert "missing fields ['weapons']" in validate_extraction(record, TEXT)
+
+
+@pytest.mark.parametrize("text", [
+    "on 12 Jan 24 cadres moved",
+    "dated 05-Mar-2024",
+    "on 3 September 2023",
+    "report of 12/01/2024",
+    "on 4 Mar, 2024"
+])
+def test_dates_are_found(text):
+    assert find_regex_fields(text)["date"]
+
+
+@pytest.mark.parametrize("text", [
+    "recovered 3 Nos 303 rifles",
+    "about 15 cadres 200 m from the post",
+    "seized 2 AK 47 and 30 rds",
+    "group of 3 12 bore guns"
+])
+def test_quantities_are_not_dates(text):
+    assert not find_regex_fields(text)["date"]
@@ -0,0 +1,197 @@
+import sys
+import time
+import threading
+import subprocess
+import pytest
+
+from app.services import job_store
+from app.services.job_store import (
+    claim_job,
+    complete_job,
+    compute_job_id,
+    fail_job,
+    get_job,
+    get_job_result,
+    job_heartbeat,
+    llm_slot
+)
+from app.services.llm_scheduler import DeadlineExceeded
+
+
+@pytest.fixture
+def job_id(tmp_path):
+    pdf = tmp_path / "report.pdf"
+    pdf.write_bytes(tmp_path.name.encode())
+    return compute_job_id(str(pdf), "config")
+
+
+@pytest.fixture
+def capped(monkeypatch):
+    def set_cap(cap):
+        monkeypatch.setattr(job_store, "LLM_GLOBAL_MAX_CONCURRENCY", cap)
+    return set_cap
+
+
+def test_job_id_depends_on_config(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF")
+
+    assert compute_job_id(str(pdf), "one") != compute_job_id(str(pdf), "two")
+
+
+def test_second_claim_sees_running_then_cached(job_id):
+    assert claim_job(job_id, "report.pdf") == ("claimed", None)
+    assert claim_job(job_id, "report.pdf") == ("running", None)
+
+    complete_job(job_id, b'{"records":1}')
+
+    assert claim_job(job_id, "report.pdf") == ("cached", b'{"records":1}')
+    assert get_job(job_id)["status"] == "done"
+
+
+def test_uncached_result_is_reprocessed(job_id):
+    claim_job(job_id, "report.pdf")
+    complete_job(job_id, None)
+
+    assert get_job_result(job_id) is None
+    assert claim_job(job_id, "report.pdf") == ("claimed", None)
+
+
+def test_failed_and_stale_jobs_are_reclaimed(job_id, monkeypatch):
+    claim_job(job_id, "report.pdf")
+    fail_job(job_id, "boom")
+    assert claim_job(job_id, "report.pdf") == ("claimed", None)
+
+    monkeypatch.setattr(job_store, "JOB_STALE_SECONDS", 0)
+    assert claim_job(job_id, "report.pdf") == ("claimed", None)
+
+
+def test_global_cap_limits_concurrent_calls(capped):
+    capped(2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def call():
+        with llm_slot():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) == 2
+
+
+def test_slots_are_granted_in_priority_order(capped):
+    capped(1)
+    order = []
+
+    def call(name, priority, delay):
+        time.sleep(delay)
+        with llm_slot(priority):
+            order.append(name)
+            time.sleep(0.05)
+
+    threads = [
+        threading.Thread(target=call, args=("holder", "bulk", 0)),
+        threading.Thread(target=call, args=("bulk", "bulk", 0.01)),
+        threading.Thread(target=call, args=("interactive", "interactive", 0.02)),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert order == ["holder", "interactive", "bulk"]
+
+
+def test_deadline_passing_while_waiting_raises(capped):
+    capped(1)
+    release = threading.Event()
+
+    def holder():
+        with llm_slot():
+            release.wait(1)
+
+    t = threading.Thread(target=holder)
+    t.start()
+    time.sleep(0.05)
+
+    with pytest.raises(DeadlineExceeded):
+        with llm_slot("interactive", deadline=time.monotonic() + 0.1):
+            pass
+
+    release.set()
+    t.join()
+
+
+def test_lease_is_renewed_while_slot_is_held(capped, monkeypatch):
+    capped(1)
+    monkeypatch.setattr(job_store, "LLM_SLOT_LEASE", 0.15)
+    order = []
+
+    def long_call():
+        with llm_slot():
+            order.append("long start")
+            time.sleep(0.5)
+            order.append("long end")
+
+    def other():
+        time.sleep(0.05)
+        with llm_slot():
+            order.append("other")
+
+    threads = [threading.Thread(target=long_call), threading.Thread(target=other)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert order == ["long start", "long end", "other"]
+
+
+def test_heartbeat_keeps_long_job_claimed(job_id, monkeypatch):
+    monkeypatch.setattr(job_store, "JOB_HEARTBEAT_INTERVAL", 0.05)
+    monkeypatch.setattr(job_store, "JOB_STALE_SECONDS", 0.2)
+    claim_job(job_id, "report.pdf")
+
+    with job_heartbeat(job_id):
+        time.sleep(0.5)
+        assert claim_job(job_id, "report.pdf") == ("running", None)
+
+    time.sleep(0.3)
+    assert claim_job(job_id, "report.pdf") == ("claimed", None)
+
+
+def test_job_of_dead_process_is_reclaimed(job_id):
+    claim_job(job_id, "report.pdf")
+
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    with job_store._transaction() as conn:
+        conn.execute("UPDATE jobs SET owner_pid = ? WHERE job_id = ?", (dead.pid, job_id))
+
+    assert claim_job(job_id, "report.pdf") == ("claimed", None)
+
+
+def test_expired_results_are_purged(job_id, tmp_path, monkeypatch):
+    claim_job(job_id, "report.pdf")
+    complete_job(job_id, b'{"records":1}')
+
+    monkeypatch.setattr(job_store, "RESULT_CACHE_TTL", 0)
+    monkeypatch.setattr(job_store, "RESULT_MIN_RETENTION", 0)
+
+    other = tmp_path / "other.pdf"
+    other.write_bytes(b"%PDF other")
+    claim_job(compute_job_id(str(other), "config"), "other.pdf")
+
+    assert get_job_result(job_id) is None
+    assert get_job(job_id)["status"] == "done"
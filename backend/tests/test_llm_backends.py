@@ -0,0 +1,149 @@
+import json
+import requests
+import pytest
+
+from app.services import llm_backends
+from app.services.llm_backends import (
+    LLMBackendError,
+    LLMRouter,
+    OllamaBackend,
+    StubBackend
+)
+
+MESSAGES = [
+    {"role": "system", "content": "system"},
+    {"role": "user", "content": "\nExtract:\n\nMovement of cadres on 12 Jan 24\n\nReturn JSON.\n"}
+]
+
+
+class FakeResponse:
+
+    def __init__(self, status_code=200, content='{"date": null}'):
+        self.status_code = status_code
+        self._content = content
+
+    def json(self):
+        return {"message": {"content": self._content}}
+
+
+class ScriptedSession:
+    """
+    Stands in for the shared requests session. Each POST to a URL pops
+    the next scripted outcome: an exception to raise or a FakeResponse.
+    """
+
+    def __init__(self, script: dict):
+        self.script = script
+        self.calls = []
+
+    def post(self, url, json=None, timeout=None):
+        self.calls.append(url)
+        outcome = self.script[url].pop(0) if len(self.script[url]) > 1 else self.script[url][0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def get(self, url, timeout=None):
+        return FakeResponse()
+
+
+def _chat(router):
+    return router.chat("m", MESSAGES, num_ctx=2048, num_predict=100, temperature=0.1, timeout=1)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(script):
+        fake = ScriptedSession(script)
+        monkeypatch.setattr(llm_backends, "session", fake)
+        return fake
+    return install
+
+
+def test_stub_backend_returns_record_json():
+    content = StubBackend().chat("m", MESSAGES, 2048, 100, 0.1, 1)
+    parsed = json.loads(content)
+
+    assert parsed["date"] == "12 Jan 24"
+    assert parsed["heading"] == "Movement of cadres on 12 Jan 24"
+
+
+def test_single_endpoint_read_timeout_keeps_endpoint(session):
+    fake = session({"a": [requests.ReadTimeout("read timed out"), FakeResponse()]})
+    router = LLMRouter([OllamaBackend("a")])
+
+    with pytest.raises(LLMBackendError):
+        _chat(router)
+
+    # The next call is still sent to the endpoint
+    assert _chat(router) == '{"date": null}'
+    assert fake.calls == ["a", "a"]
+    assert router.status()[0]["healthy"]
+
+
+def test_missing_model_404_does_not_park(session):
+    session({"a": [FakeResponse(404)], "b": [FakeResponse()]})
+    router = LLMRouter([OllamaBackend("a"), OllamaBackend("b")])
+
+    assert _chat(router) == '{"date": null}'
+    assert all(s["healthy"] for s in router.status())
+
+
+def test_connection_error_fails_over_and_parks(session):
+    fake = session({"a": [requests.ConnectionError("refused")], "b": [FakeResponse()]})
+    router = LLMRouter([OllamaBackend("a"), OllamaBackend("b")])
+
+    assert _chat(router) == '{"date": null}'
+    assert [s["healthy"] for s in router.status()] == [False, True]
+
+    # Parked endpoint is skipped during its cooldown
+    fake.calls.clear()
+    _chat(router)
+    assert fake.calls == ["b"]
+
+
+def test_last_healthy_endpoint_is_never_parked(session):
+    fake = session({"a": [requests.ConnectionError("refused"), FakeResponse()]})
+    router = LLMRouter([OllamaBackend("a")])
+
+    with pytest.raises(LLMBackendError):
+        _chat(router)
+
+    assert router.status()[0]["healthy"]
+    assert _chat(router) == '{"date": null}'
+    assert fake.calls == ["a", "a"]
+
+
+def test_server_errors_park_after_threshold(session, monkeypatch):
+    monkeypatch.setattr(llm_backends, "LLM_MAX_SERVER_ERRORS", 2)
+    session({"a": [FakeResponse(500)], "b": [FakeResponse()]})
+    router = LLMRouter([OllamaBackend("a"), OllamaBackend("b")])
+    router._endpoints[1].in_flight = 1  # steer calls to "a" first
+
+    _chat(router)
+    assert router.status()[0]["healthy"]
+
+    _chat(router)
+    assert not router.status()[0]["healthy"]
+
+
+def test_parked_endpoint_returns_after_health_check(session, monkeypatch):
+    monkeypatch.setattr(llm_backends, "LLM_HEALTH_COOLDOWN", 0)
+    session({"a": [requests.ConnectionError("refused"), FakeResponse()], "b": [FakeResponse()]})
+    router = LLMRouter([OllamaBackend("a"), OllamaBackend("b")])
+
+    _chat(router)
+    assert not router.status()[0]["healthy"]
+
+    _chat(router)
+    assert router.status()[0]["healthy"]
+
+
+def test_least_outstanding_endpoint_is_chosen(session):
+    fake = session({"a": [FakeResponse()], "b": [FakeResponse()]})
+    router = LLMRouter([OllamaBackend("a"), OllamaBackend("b")])
+    router._endpoints[0].in_flight = 3
+
+    _chat(router)
+
+    assert fake.calls == ["b"]
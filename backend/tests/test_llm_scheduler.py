@@ -0,0 +1,102 @@
+import time
+import threading
+import pytest
+
+from app.services.llm_scheduler import DeadlineExceeded, LLMScheduler, current_job
+
+
+def test_interactive_blocks_run_between_bulk_blocks():
+    scheduler = LLMScheduler(1)
+    order = []
+    gate = threading.Event()
+
+    def work(block):
+        if block == "b0":
+            gate.wait(1)
+        order.append(block)
+        return block
+
+    bulk = scheduler.submit([f"b{i}" for i in range(4)], work, "bulk")
+    time.sleep(0.05)  # b0 is running
+    interactive = scheduler.submit(["i0", "i1"], work, "interactive")
+    gate.set()
+
+    assert interactive.wait() == ["i0", "i1"]
+    assert bulk.wait() == ["b0", "b1", "b2", "b3"]
+    assert order == ["b0", "i0", "i1", "b1", "b2", "b3"]
+
+
+def test_earlier_deadline_runs_first_within_class():
+    scheduler = LLMScheduler(1)
+    order = []
+    gate = threading.Event()
+
+    def work(block):
+        if block == "hold":
+            gate.wait(1)
+        order.append(block)
+
+    scheduler.submit(["hold"], work, "bulk")
+    time.sleep(0.05)
+    late = scheduler.submit(["late"], work, "interactive", deadline=time.monotonic() + 60)
+    soon = scheduler.submit(["soon"], work, "interactive", deadline=time.monotonic() + 5)
+    gate.set()
+    late.wait()
+    soon.wait()
+
+    assert order == ["hold", "soon", "late"]
+
+
+def test_expired_job_is_cancelled_and_blocks_dropped():
+    scheduler = LLMScheduler(1)
+    ran = []
+
+    def work(block):
+        time.sleep(0.05)
+        ran.append(block)
+
+    job = scheduler.submit(list(range(20)), work, "bulk", deadline=time.monotonic() + 0.12)
+
+    with pytest.raises(DeadlineExceeded):
+        job.wait()
+
+    time.sleep(0.2)
+    assert len(ran) < 20
+    assert scheduler.stats()["bulk"]["dropped_blocks"] > 0
+
+
+def test_block_error_fails_the_job():
+    scheduler = LLMScheduler(2)
+
+    def work(block):
+        if block == 2:
+            raise RuntimeError("boom")
+        return block
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit([1, 2, 3], work).wait()
+
+
+def test_current_job_is_visible_to_block_function():
+    scheduler = LLMScheduler(1)
+
+    job = scheduler.submit(["x"], lambda block: current_job().priority, "bulk")
+
+    assert job.wait() == ["bulk"]
+    assert current_job() is None
+
+
+def test_queue_wait_is_reported_per_class():
+    scheduler = LLMScheduler(1)
+
+    scheduler.submit([1, 2, 3], lambda block: time.sleep(0.02), "bulk").wait()
+    stats = scheduler.stats()
+
+    assert stats["bulk"]["blocks"] == 3
+    assert stats["bulk"]["max_wait_s"] > 0
+    assert stats["interactive"]["blocks"] == 0
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        LLMScheduler(1).submit([1], lambda block: block, "urgent")
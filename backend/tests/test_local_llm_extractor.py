@@ -0,0 +1,178 @@
+import json
+import time
+import threading
+import pytest
+
+from app.services import local_llm_extractor as extractor
+from app.services.token_budget import plan_request
+from app.services.llm_backends import LLMBackendError
+from app.services.llm_scheduler import DeadlineExceeded, LLMScheduler
+from app.services.local_llm_extractor import (
+    TierStats,
+    extract_semantic_fields,
+    extract_multiple_blocks_parallel
+)
+
+RECORD = "Movement of cadres\n12 Jan 24 five cadres of NSCN moved near Mon village area"
+
+
+def test_stub_extraction_fills_schema():
+    result = extract_semantic_fields(RECORD)
+
+    assert set(result) >= set(extractor.SCHEMA)
+    assert result["date"] == "12 Jan 24"
+    assert result["heading"] == "Movement of cadres"
+
+
+def test_parallel_extraction_keeps_block_order():
+    blocks = [f"Report {i}\n{i + 1} Jan 24 movement observed near the border post" for i in range(6)]
+    stats = TierStats()
+
+    records = extract_multiple_blocks_parallel(blocks, stats)
+
+    assert [r.heading for r in records] == [f"Report {i}" for i in range(6)]
+    summary = stats.summary()
+    assert summary["tiers"]["large"]["calls"] == 6
+    assert summary["failed_blocks"] == 0
+    assert summary["queue"]["priority"] == "interactive"
+
+
+def test_oversized_record_is_chunked_not_truncated(monkeypatch):
+    calls = []
+    real_call = extractor._call_llm
+
+    def spy(text, model, num_ctx, num_predict):
+        calls.append((text, num_ctx))
+        return real_call(text, model, num_ctx, num_predict)
+
+    monkeypatch.setattr(extractor, "_call_llm", spy)
+
+    lines = [f"Line {i}: cadres observed moving along the river bank" for i in range(3000)]
+    extract_semantic_fields("\n".join(lines))
+
+    assert len(calls) > 1
+    assert all(num_ctx == extractor.LLM_CTX_BUCKETS[-1] for _, num_ctx in calls)
+    assert "\n".join(text for text, _ in calls) == "\n".join(lines)
+
+
+def test_chunks_fit_context_with_real_tokenizer_counts(monkeypatch, tokenizer):
+    tokenizer()
+    calls = []
+
+    def spy(text, model, num_ctx, num_predict):
+        calls.append((text, num_ctx, num_predict))
+        return None
+
+    monkeypatch.setattr(extractor, "_call_llm", spy)
+
+    lines = [f"Line {i}: cadres observed moving along the river bank" for i in range(3000)]
+    extract_semantic_fields("\n".join(lines))
+
+    assert len(calls) > 1
+    for text, num_ctx, num_predict in calls:
+        assert plan_request(text, extractor.PROMPT_OVERHEAD) == (num_ctx, num_predict)
+
+
+def test_small_model_low_confidence_escalates(monkeypatch):
+    monkeypatch.setattr(extractor, "LLM_SMALL_MODEL", "stub-small")
+    stats = TierStats()
+
+    # The stub fills 3 of 19 fields, above the null-ratio threshold
+    extract_semantic_fields(RECORD, stats)
+
+    summary = stats.summary()
+    assert summary["tiers"]["small"]["calls"] == 1
+    assert summary["tiers"]["small"]["accepted"] == 0
+    assert summary["tiers"]["large"]["calls"] == 1
+    assert summary["escalated"] == 1
+
+
+def _small_model_answer(monkeypatch, answer):
+    real_chat = extractor.router.chat
+
+    def chat(model, messages, **kwargs):
+        if model == "stub-small":
+            return json.dumps(answer)
+        return real_chat(model, messages, **kwargs)
+
+    monkeypatch.setattr(extractor, "LLM_SMALL_MODEL", "stub-small")
+    monkeypatch.setattr(extractor.router, "chat", chat)
+
+
+SMALL_ANSWER = dict(
+    extractor.SCHEMA,
+    date="12 Jan 24",
+    gp="NSCN",
+    gen_area="Mon village",
+    heading="Movement of cadres",
+    input_summary="Five cadres of NSCN moved near Mon village",
+    engagement_type_reasoned="Movement",
+    cadres_min=5,
+    cadres_max=5
+)
+
+
+def test_complete_small_model_answer_is_accepted(monkeypatch):
+    _small_model_answer(monkeypatch, SMALL_ANSWER)
+    stats = TierStats()
+
+    assert extract_semantic_fields(RECORD, stats) == SMALL_ANSWER
+    assert stats.summary()["escalated"] == 0
+
+
+def test_small_model_answer_missing_keys_escalates(monkeypatch):
+    answer = {k: v for k, v in SMALL_ANSWER.items() if k not in ("weapons", "leader")}
+    _small_model_answer(monkeypatch, answer)
+    stats = TierStats()
+
+    result = extract_semantic_fields(RECORD, stats)
+
+    assert stats.summary()["escalated"] == 1
+    assert stats.summary()["tiers"]["large"]["calls"] == 1
+    assert set(result) == set(extractor.SCHEMA)
+
+
+def test_block_stops_calling_llm_after_deadline(monkeypatch):
+    models = []
+    block_done = threading.Event()
+
+    def slow_chat(model, messages, **kwargs):
+        models.append(model)
+        time.sleep(0.2)
+        return json.dumps({"heading": "x"})
+
+    monkeypatch.setattr(extractor, "LLM_SMALL_MODEL", "stub-small")
+    monkeypatch.setattr(extractor.router, "chat", slow_chat)
+
+    def run(block):
+        try:
+            return extract_semantic_fields(block)
+        finally:
+            block_done.set()
+
+    job = LLMScheduler(1).submit([RECORD], run, deadline=time.monotonic() + 0.1)
+
+    with pytest.raises(DeadlineExceeded):
+        job.wait()
+
+    # The small model answer fails validation, but no escalation follows
+    assert block_done.wait(1)
+    assert models == ["stub-small"]
+
+
+def test_backend_failure_counts_as_failed_block(monkeypatch):
+    def fail(*args, **kwargs):
+        raise LLMBackendError("No LLM endpoint available")
+
+    monkeypatch.setattr(extractor.router, "chat", fail)
+    stats = TierStats()
+
+    result = extract_semantic_fields(RECORD, stats)
+
+    assert result["input_summary"] == RECORD[:300]
+    assert stats.summary()["failed_blocks"] == 1
+
+
+@pytest.mark.parametrize("text", ["", "   ", "short"])
+def test_empty_input_skips_llm(text):
+    assert extract_semantic_fields(text) == extractor.SCHEMA
@@ -0,0 +1,43 @@
+import pytest
+
+from app.schemas.semantic_schema import (
+    SEMANTIC_FIELDS,
+    IntelRecord,
+    record_from_dict,
+    to_columnar
+)
+
+
+def test_record_from_dict_keeps_schema_fields_only():
+    record = record_from_dict({"date": "12 Jan 24", "gp": "NSCN", "confidence": 0.9})
+
+    assert record.date == "12 Jan 24"
+    assert record.gp == "NSCN"
+    assert record.leader is None
+    assert not hasattr(record, "confidence")
+
+
+def test_record_is_slotted():
+    record = IntelRecord()
+
+    assert not hasattr(record, "__dict__")
+    with pytest.raises(AttributeError):
+        record.extra = 1
+
+
+def test_to_columnar_accepts_records_and_dicts():
+    rows = [
+        record_from_dict({"date": "12 Jan 24", "cadres_min": 5}),
+        {"date": "13 Jan 24", "gp": "ULFA"}
+    ]
+
+    columns = to_columnar(rows)
+
+    assert list(columns) == list(SEMANTIC_FIELDS)
+    assert columns["date"] == ["12 Jan 24", "13 Jan 24"]
+    assert columns["cadres_min"] == [5, None]
+    assert columns["gp"] == [None, "ULFA"]
+
+
+def test_to_columnar_of_no_rows_has_empty_columns():
+    assert to_columnar([]) == {name: [] for name in SEMANTIC_FIELDS}
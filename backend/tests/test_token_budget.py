@@ -0,0 +1,102 @@
+import pytest
+
+from app.services import token_budget
+from app.services.token_budget import (
+    LLM_CTX_BUCKETS,
+    LLM_MAX_PREDICT,
+    count_tokens,
+    estimate_num_predict,
+    max_chunk_tokens,
+    plan_chunks,
+    plan_request,
+    select_num_ctx,
+    split_by_tokens
+)
+
+OVERHEAD = 1200
+
+
+def test_smallest_fitting_bucket_is_chosen():
+    short = plan_request("x" * 100, OVERHEAD)
+    longer = plan_request("x" * 12000, OVERHEAD)
+
+    assert short[0] < longer[0]
+    assert short[0] in LLM_CTX_BUCKETS and longer[0] in LLM_CTX_BUCKETS
+
+
+def test_record_beyond_largest_bucket_needs_chunking():
+    assert plan_request("x" * 100000, OVERHEAD) is None
+
+
+def test_estimate_margin_is_proportional(monkeypatch):
+    bucket = LLM_CTX_BUCKETS[-1]
+
+    # A count that fits with the flat margin alone is rejected when
+    # the 15% estimate margin pushes it over the bucket
+    required = bucket - token_budget.LLM_CTX_MARGIN - 100
+    assert select_num_ctx(required) is None
+
+    monkeypatch.setattr(token_budget, "LLM_ESTIMATE_MARGIN", 0.0)
+    assert select_num_ctx(required) == bucket
+
+
+def test_num_predict_scales_with_input_and_is_capped():
+    assert estimate_num_predict(50) < estimate_num_predict(400)
+    assert estimate_num_predict(100000) <= LLM_MAX_PREDICT
+
+
+def test_split_keeps_every_line_and_fits_budget():
+    text = "\n".join(f"Line {i}: cadres moved towards the border post" for i in range(2000))
+    limit = max_chunk_tokens(OVERHEAD)
+
+    chunks = split_by_tokens(text, limit)
+
+    assert len(chunks) > 1
+    assert "\n".join(chunks) == text
+    assert all(plan_request(c, OVERHEAD) is not None for c in chunks)
+
+
+def test_split_cuts_overlong_line():
+    line = "7.62mm" * 20000
+    chunks = split_by_tokens(line, 1000)
+
+    assert "".join(chunks) == line
+    assert all(count_tokens(c) <= 1000 for c in chunks)
+
+
+def test_split_rejects_non_positive_budget():
+    with pytest.raises(ValueError):
+        split_by_tokens("text", 0)
+
+
+def test_split_counts_line_separators(tokenizer):
+    tokenizer()
+    text = "\n".join(f"Line {i}: cadres observed moving along the river bank" for i in range(3000))
+    limit = max_chunk_tokens(OVERHEAD)
+
+    chunks = split_by_tokens(text, limit)
+
+    assert all(count_tokens(c) <= limit for c in chunks)
+    assert all(plan_request(c, OVERHEAD) is not None for c in chunks)
+
+
+def test_split_cuts_line_of_uneven_density(tokenizer):
+    tokenizer()
+    line = "cadres " * 3000 + "1,2," * 3000
+
+    chunks = split_by_tokens(line, 1000)
+
+    assert "".join(chunks) == line
+    assert all(count_tokens(c) <= 1000 for c in chunks)
+
+
+def test_plan_chunks_resplits_chunks_that_do_not_fit(tokenizer):
+    # Newlines cost more than the one token split_by_tokens assumes
+    tokenizer(newline_cost=4)
+    text = "\n".join(f"Line {i}: cadres observed moving along the river bank" for i in range(3000))
+
+    planned = plan_chunks(text, OVERHEAD)
+
+    assert "\n".join(chunk for chunk, _, _ in planned) == text
+    for chunk, num_ctx, num_predict in planned:
+        assert plan_request(chunk, OVERHEAD) == (num_ctx, num_predict)
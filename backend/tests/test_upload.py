@@ -0,0 +1,99 @@
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.app import create_app
+from app.routes import upload
+from app.routes.upload import _render
+from app.schemas.semantic_schema import SEMANTIC_FIELDS, record_from_dict
+
+BLOCK = "Movement of cadres {i}\n{day} Jan 24 five cadres of NSCN moved near Mon village area"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # PDF parsing is replaced; the blocks go through the stub LLM backend
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(upload, "detect_pdf_type", lambda path: "narrative")
+    monkeypatch.setattr(
+        upload,
+        "extract_narrative_markdown",
+        lambda path: open(path, encoding="utf-8").read()
+    )
+    monkeypatch.setattr(upload, "split_records", lambda text: text.split("\n\n"))
+    return TestClient(create_app())
+
+
+def _post(client, blocks: int, name: str, response_format: str = "rows", headers=None):
+    text = "\n\n".join(BLOCK.format(i=f"{name} {i}", day=i % 28 + 1) for i in range(blocks))
+    return client.post(
+        f"/upload?format={response_format}",
+        files={"file": (f"{name}.pdf", text.encode(), "application/pdf")},
+        headers=headers
+    )
+
+
+def _columns_to_rows(payload: dict) -> list:
+    data = payload["data"]
+    return [
+        {name: data[name][i] for name in payload["columns"]}
+        for i in range(payload["records"])
+    ]
+
+
+def test_render_splices_job_fields_into_body():
+    result = {"status": "success", "records": 1, "data": [record_from_dict({"date": "12 Jan 24"})]}
+    body = orjson.dumps(result)
+
+    for cached in (False, True):
+        response = _render(body, "abc", cached, "rows")
+        payload = orjson.loads(response.body)
+
+        assert payload["job_id"] == "abc"
+        assert payload["cached"] is cached
+        assert payload["data"][0]["date"] == "12 Jan 24"
+        assert list(payload["data"][0]) == list(SEMANTIC_FIELDS)
+
+
+def test_fresh_and_cached_rows_match(client):
+    fresh = _post(client, 3, "rows")
+    cached = _post(client, 3, "rows")
+
+    assert fresh.status_code == cached.status_code == 200
+    assert fresh.json()["cached"] is False
+    assert cached.json()["cached"] is True
+    assert cached.json()["job_id"] == fresh.json()["job_id"]
+    assert cached.json()["data"] == fresh.json()["data"]
+    assert [r["heading"] for r in fresh.json()["data"]] == [
+        f"Movement of cadres rows {i}" for i in range(3)
+    ]
+
+
+@pytest.mark.parametrize("first", ["rows", "columnar"])
+def test_rows_and_columnar_decode_to_same_records(client, first):
+    second = "columnar" if first == "rows" else "rows"
+
+    # The first request is processed, the second served from cache
+    responses = {
+        first: _post(client, 4, f"formats-{first}", first).json(),
+        second: _post(client, 4, f"formats-{first}", second).json()
+    }
+
+    assert responses[first]["cached"] is False
+    assert responses[second]["cached"] is True
+    assert responses["columnar"]["format"] == "columnar"
+    assert _columns_to_rows(responses["columnar"]) == responses["rows"]["data"]
+
+
+def test_large_response_is_compressed(client):
+    response = _post(client, 30, "large", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] in ("gzip", "br")
+    assert response.json()["records"] == 30
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.get("/scheduler/stats", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
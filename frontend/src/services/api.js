@@ -4,11 +4,41 @@ const API = axios.create({
   baseURL: "http://127.0.0.1:5000",
 });
 
-export const uploadPDF = (formData) =>
-  API.post("/upload", formData, {
+// Rebuild row objects for DataTable from a columnar response
+// ({ columns: [...], data: { field: [values] } }).
+export const columnarToRows = (columns, data) => {
+  const count = columns.length > 0 ? data[columns[0]].length : 0;
+  const rows = new Array(count);
+  for (let i = 0; i < count; i++) {
+    const row = {};
+    columns.forEach((col) => {
+      row[col] = data[col][i];
+    });
+    rows[i] = row;
+  }
+  return rows;
+};
+
+// Requests the columnar format (smaller on the wire) and returns rows.
+// UI uploads are interactive; pass priority "bulk" for archive runs.
+export const uploadPDF = async (formData, { priority = "interactive", deadline } = {}) => {
+  const params = { format: "columnar", priority };
+  if (deadline) {
+    params.deadline = deadline;
+  }
+
+  const response = await API.post("/upload", formData, {
     headers: { "Content-Type": "multipart/form-data" },
+    params,
   });
 
+  if (response.data.format === "columnar") {
+    response.data.data = columnarToRows(response.data.columns, response.data.data);
+  }
+
+  return response;
+};
+
 export const exportToExcel = async (data, filename = "intelligence_data") => {
   try {
     const response = await API.post("/export", 